@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 import sys
-import subprocess
+import os
 import json
-import base64
+import hashlib
 import argparse
-from typing import Optional, Tuple, NoReturn
-from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, NoReturn
+
+from rulecmp.github import get_changed_files, get_file_content_from_pr, get_pr_shas
+from rulecmp.sections import get_section_from_content
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                         "openssf-rulecmp")
+# Part of every cache key. Bump it whenever get_section_from_content changes what it
+# extracts, so that values cached by an older version are not reused.
+CACHE_VERSION = 2
 
 
 def parse_args() -> argparse.Namespace:
@@ -24,170 +33,127 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("pr_number", type=int, help="The Pull Request number.")
     parser.add_argument("file_path", type=str, help="The file path within the repository.")
     parser.add_argument("key", type=str, help="The key to be checked in the file.")
+    # Optional arguments
+    parser.add_argument("--check-changed-files", action="store_true",
+                        help="Exit early when the PR does not modify the file. This costs an "
+                             "extra API request, so it is only worth it when the file is not "
+                             "already known to be changed by the PR.")
 
     return parser.parse_args()
 
 
-def run_command(command: list[str]) -> tuple[int, str, str]:
-    """Runs a shell command and returns its exit code, stdout, and stderr."""
-    res = subprocess.run(command, capture_output=True, text=True, check=False)
-    return res.returncode, res.stdout, res.stderr
-
-
-def get_file_content_from_pr(owner: str, repo: str, sha: str, file_path: str) -> str:
-    """Fetches file content for a given commit SHA using the GitHub API.
-    The base64 encoding and decoding step is necessary because of how the
-    GitHub API is designed to transmit file content.
-    """
-    api_path = f"/repos/{owner}/{repo}/contents/{file_path}?ref={sha}"
-    print(f"-> Fetching file content for '{file_path}' from commit {sha[:7]}...")
-    returncode, stdout, stderr = run_command(["gh", "api", api_path])
-
-    if returncode != 0:
-        print(f"Exception: Could not fetch file. It may be new or deleted. "
-              f"(stderr: {stderr.strip()})")
-        return ""
+def get_cache_path(owner: str, repo: str, sha: str, file_path: str, key: str) -> str:
+    """Returns the path of the on-disk cache entry for a key of a file at a commit."""
+    cache_id = f"{CACHE_VERSION}:{owner}/{repo}:{sha}:{file_path}:{key}"
+    cache_key = hashlib.sha256(cache_id.encode()).hexdigest()
+    return os.path.join(CACHE_DIR, cache_key + ".json")
 
+def read_cached_value(cache_path: str) -> Optional[str]:
+    """Returns the value stored in a cache entry, or None on a cache miss."""
     try:
-        content_json = json.loads(stdout)
-        encoded_content = content_json.get('content', '')
-        if not encoded_content:
-            return ""
-
-        return base64.b64decode(encoded_content).decode('utf-8')
-    except (json.JSONDecodeError, KeyError, TypeError) as e:
-        print(f"Exception: Could not parse or decode content. Error: {e}", file=sys.stderr)
-        return ""
-
-def find_section_lines(file_contents, sec):
-    """
-    Parses the given file_contents as YAML to find the section with the given identifier.
-
-    Note that this does not call into the yaml library and thus correctly handles Jinja macros at
-    the expense of not being a strictly valid yaml parsing.
-
-    Args:
-        file_contents (list of str): The contents of the file, split into lines.
-        sec (str): The identifier of the section to find.
-
-    Returns:
-        list of namedtuple: A list of namedtuples (start, end) representing the lines where the
-                            section exists.
-    """
-    # Hack to find a global key ("section"/sec) in a YAML-like file.
-    # All indented lines until the next global key are included in the range.
-    # For example:
-    #
-    # 0: not_it:
-    # 1:     - value
-    # 2: this_one:
-    # 3:      - 2
-    # 4:      - 5
-    # 5:
-    # 6: nor_this:
-    #
-    # for the section "this_one", the result [(2, 5)] will be returned.
-    # Note that multiple sections may exist in a file and each will be
-    # identified and returned.
-    section = namedtuple('section', ['start', 'end'])
-
-    sec_ranges = []
-    sec_id = sec + ":"
-    sec_len = len(sec_id)
-    end_num = len(file_contents)
-    line_num = 0
-
-    while line_num < end_num:
-        if len(file_contents[line_num]) >= sec_len:
-            if file_contents[line_num][0:sec_len] == sec_id:
-                begin = line_num
-                line_num += 1
-                while line_num < end_num:
-                    nonempty_line = file_contents[line_num]
-                    if nonempty_line and file_contents[line_num][0] != ' ':
-                        break
-                    line_num += 1
-
-                end = line_num - 1
-                sec_ranges.append(section(begin, end))
-        line_num += 1
-
-    return sec_ranges
-
-def get_section_from_content(content: str, section: str) -> Optional[str]:
-    """
-    Extracts a section's value from a string containing the file content.
-    """
-    if not content:
+        with open(cache_path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
         return None
 
-    lines = content.splitlines()
-    found_ranges = find_section_lines(lines, section)
- 
-    if found_ranges:
-        start, end = found_ranges[0]
-        section_content = lines[start : end + 1]
-        return '\n'.join(section_content)
-
-    return None
-
-def get_pr_shas(owner: str, repo: str, pr_number: int) -> Tuple[str, str]:
-    """
-    Fetches the base and head commit SHAs for a PR.
+def write_cached_value(cache_path: str, value: str) -> None:
+    """Stores a value in a cache entry. Failing to write the cache is not an error."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(value, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Exception: Could not write cache entry. Error: {e}", file=sys.stderr)
+
+def get_cached_value(owner: str, repo: str, file_path: str, key: str, sha: str) -> Optional[str]:
     """
-    gh_pr_command = [
-        "gh", "pr", "view", str(pr_number),
-        "--repo", f"{owner}/{repo}",
-        "--json", "baseRefOid,headRefOid"
-    ]
-    returncode, stdout, stderr = run_command(gh_pr_command)
+    Returns the value of a key extracted from a file at a commit by a previous
+    run, or None if it is not cached.
 
-    if returncode != 0:
-        raise RuntimeError(f"Failed to get PR details. GitHub CLI stderr: {stderr.strip()}")
+    Commits are immutable, so cached values only need to be invalidated when
+    the extraction itself changes, which CACHE_VERSION takes care of.
+    """
+    value = read_cached_value(get_cache_path(owner, repo, sha, file_path, key))
+    if value is not None:
+        print(f"-> Using cached value for '{file_path}' from commit {sha[:7]}.")
+    return value
 
-    try:
-        shas = json.loads(stdout)
-        base_sha = shas['baseRefOid']
-        head_sha = shas['headRefOid']
-        return base_sha, head_sha
-    except (json.JSONDecodeError, KeyError) as e:
-        raise ValueError(f"Could not parse commit SHAs from API response. Error: {e}") from e
-
-def get_value_from_commit(owner: str, repo: str, file_path: str, key: str, sha: str) -> Optional[str]:
+def get_value_from_content(owner: str, repo: str, file_path: str, key: str, sha: str,
+                           content: bytes) -> Optional[str]:
     """
-    Fetches a file from a specific commit and extracts the value of a given key.
+    Extracts the value of a given key from the content of a file at a commit,
+    and caches it on disk for later runs.
 
     Args:
         owner: The repository owner.
         repo: The repository name.
         file_path: The path to the file within the repository.
         key: The key/section to extract from the file's content.
-        sha: The commit SHA from which to retrieve the file.
+        sha: The commit SHA the content was retrieved from.
+        content: The raw bytes of the file's content.
 
     Returns:
         The extracted value as a string, or None if the file or key is not found.
     """
-    # 1. Fetch the file's content for the given commit SHA.
-    content = get_file_content_from_pr(owner, repo, sha, file_path)
-
-    # 2. Parse the content to get the desired value.
     value = get_section_from_content(content, key)
 
+    # A missing value is not cached, as it may come from a failed fetch.
+    if value is not None:
+        write_cached_value(get_cache_path(owner, repo, sha, file_path, key), value)
+
     return value
 
-def compare_value(owner: str, repo: str, pr_number: int, file_path: str, key: str) -> NoReturn:
+def compare_value(owner: str, repo: str, pr_number: int, file_path: str, key: str,
+                  check_changed_files: bool = False) -> NoReturn:
     """
     This function handles the entire process:
-    1. Fetches the base and head commit SHAs for the PR.
-    2. Retrieves the value of the specified key from the file at both commits.
-    3. Compares the two values, prints a report, and exits with a status code.
+    1. Fetches the base and head commit SHAs for the PR, and with
+       check_changed_files, stops early if the PR does not touch the file.
+    2. Retrieves the value of the specified key from the file at both commits,
+       from the cache or by fetching both files concurrently. Parsing is skipped
+       when both files are identical.
+    3. Compares the two values, prints a report, and exits with a status code:
+       0 if the values are the same, 1 if they differ, and 2 if a file could
+       not be fetched.
     """
     # 1. Get the base and head commit SHAs.
     base_sha, head_sha = get_pr_shas(owner, repo, pr_number)
 
-    # 2. Fetch and parse the values from the commits.
-    before_value = get_value_from_commit(owner, repo, file_path, key, base_sha)
-    after_value = get_value_from_commit(owner, repo, file_path, key, head_sha)
+    if check_changed_files:
+        changed_files = get_changed_files(owner, repo, base_sha, head_sha)
+        if changed_files is not None and file_path not in changed_files:
+            print(f"\n'{file_path}' is not modified by the PR.")
+            print("\nNo changes detected for the specified keys.")
+            sys.exit(0)
+
+    # 2. Get the values from the cache, or else fetch and parse the files. Both
+    #    fetches are network-bound, so they run in parallel.
+    before_value = get_cached_value(owner, repo, file_path, key, base_sha)
+    after_value = get_cached_value(owner, repo, file_path, key, head_sha)
+
+    if before_value is None or after_value is None:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            before_future = executor.submit(get_file_content_from_pr, owner, repo, base_sha, file_path)
+            after_future = executor.submit(get_file_content_from_pr, owner, repo, head_sha, file_path)
+            try:
+                before_content = before_future.result()
+                after_content = after_future.result()
+            except RuntimeError as e:
+                # The values cannot be compared, which must not pass for "no changes".
+                print(f"Exception: {e}", file=sys.stderr)
+                sys.exit(2)
+
+        # Identical files hold identical values, so there is nothing to parse. A file missing
+        # from both commits is left to the report below.
+        if before_content and before_content == after_content:
+            print("\nThe file is identical in both branches.")
+            print("\nNo changes detected for the specified keys.")
+            sys.exit(0)
+
+        before_value = get_value_from_content(owner, repo, file_path, key, base_sha, before_content)
+        after_value = get_value_from_content(owner, repo, file_path, key, head_sha, after_content)
 
     # 3. Compare the results and print the final output.
     print("\n--- Comparison Result ---")
@@ -204,7 +170,8 @@ def compare_value(owner: str, repo: str, pr_number: int, file_path: str, key: st
 
 def main()-> None:
     args = parse_args()
-    compare_value(args.owner, args.repo, args.pr_number, args.file_path, args.key)
+    compare_value(args.owner, args.repo, args.pr_number, args.file_path, args.key,
+                  args.check_changed_files)
 
 
 if __name__ == "__main__":
@@ -14,11 +14,12 @@ echo "Head SHA (After):  $HEAD_SHA"
 # Set the path to your YAML file
 FILE_PATH="rule.yml"
 
+# The raw media type returns the file itself rather than base64-encoded JSON
 # Fetch the 'before' content (from the base branch)
-BEFORE_CONTENT=$(gh api "/repos/$OWNER/$REPO/contents/$FILE_PATH?ref=$BASE_SHA" --jq '.content' | base64 --decode)
+BEFORE_CONTENT=$(gh api -H "Accept: application/vnd.github.raw" "/repos/$OWNER/$REPO/contents/$FILE_PATH?ref=$BASE_SHA")
 
 # Fetch the 'after' content (from the PR's head branch)
-AFTER_CONTENT=$(gh api "/repos/$OWNER/$REPO/contents/$FILE_PATH?ref=$HEAD_SHA" --jq '.content' | base64 --decode)
+AFTER_CONTENT=$(gh api -H "Accept: application/vnd.github.raw" "/repos/$OWNER/$REPO/contents/$FILE_PATH?ref=$HEAD_SHA")
 
 echo "$BEFORE_CONTENT" > file1.yml
 echo "$AFTER_CONTENT" > file2.yml
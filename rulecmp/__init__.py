@@ -0,0 +1,7 @@
+"""
+Shared helpers of the rule comparison scripts.
+
+The helpers are imported from their modules, so that each script only loads
+what it uses: rulecmp.github for the GitHub API, rulecmp.sections for the
+section lookup, and rulecmp.yamlutil for YAML parsing, which needs PyYAML.
+"""
@@ -0,0 +1,166 @@
+"""Access to the GitHub API shared by the comparison scripts."""
+import sys
+import os
+import shutil
+import subprocess
+import json
+import http.client
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+from typing import Optional, Tuple
+
+GITHUB_API_HOST = "api.github.com"
+# Seconds to wait for the API before giving up, so that a stalled connection fails the job.
+GITHUB_API_TIMEOUT = 30
+
+# The token is looked up once per run. Each thread keeps its own keep-alive
+# connection, since http.client connections cannot be shared between threads.
+_token: Optional[str] = None
+_token_lock = threading.Lock()
+_local = threading.local()
+# File contents fetched so far, by commit SHA and path, least recently used first. Only
+# successful fetches are stored, so that a failed one is retried.
+_CONTENTS_MAXSIZE = 128
+_contents: OrderedDict[tuple[str, str, str, str], bytes] = OrderedDict()
+_contents_lock = threading.Lock()
+
+
+def run_command(command: list[str]) -> tuple[int, str, str]:
+    """Runs a shell command and returns its exit code, stdout, and stderr."""
+    # subprocess only uses posix_spawn instead of fork+exec when the executable has a
+    # directory part and close_fds is off. Descriptors opened by Python are not
+    # inheritable, so not closing them in the child is safe.
+    executable = shutil.which(command[0]) or command[0]
+    res = subprocess.run([executable, *command[1:]], capture_output=True, text=True,
+                         check=False, close_fds=False)
+    return res.returncode, res.stdout, res.stderr
+
+
+def get_token() -> str:
+    """Returns the GitHub token, taken from the environment or `gh auth token` once per run."""
+    global _token
+    with _token_lock:
+        if _token is None:
+            token = os.environ.get("GH_TOKEN") or os.environ.get("GITHUB_TOKEN")
+            if not token:
+                returncode, stdout, stderr = run_command(["gh", "auth", "token"])
+                if returncode != 0:
+                    raise RuntimeError(f"Failed to get GitHub token. GitHub CLI stderr: {stderr.strip()}")
+                token = stdout.strip()
+            _token = token
+    return _token
+
+
+def github_get(api_path: str, accept: str = "application/vnd.github+json") -> tuple[int, bytes]:
+    """Sends a GET request to the GitHub API and returns the status code and body."""
+    headers = {
+        "Authorization": f"Bearer {get_token()}",
+        "Accept": accept,
+        "User-Agent": "openssf-compare-rule-var",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+    connection = getattr(_local, "connection", None)
+    if connection is None:
+        connection = _local.connection = http.client.HTTPSConnection(GITHUB_API_HOST,
+                                                                      timeout=GITHUB_API_TIMEOUT)
+    try:
+        connection.request("GET", api_path, headers=headers)
+        response = connection.getresponse()
+    except (http.client.HTTPException, OSError):
+        # The server may have dropped the idle keep-alive connection, retry once on a fresh one.
+        connection.close()
+        connection.request("GET", api_path, headers=headers)
+        response = connection.getresponse()
+    return response.status, response.read()
+
+
+def get_file_content_from_pr(owner: str, repo: str, sha: str, file_path: str) -> bytes:
+    """Fetches file content for a given commit SHA using the GitHub API.
+    The raw media type is requested so the response body is the file itself,
+    without the JSON envelope and base64 encoding of the default media type.
+    The content is returned undecoded, callers only decode the parts they use.
+    Files at a commit never change, so fetched contents are memoized for the process.
+    Returns empty content if the file does not exist at the commit, and raises
+    RuntimeError if the file could not be fetched.
+    """
+    cache_key = (owner, repo, sha, file_path)
+    with _contents_lock:
+        content = _contents.get(cache_key)
+        if content is not None:
+            _contents.move_to_end(cache_key)
+            return content
+
+    api_path = f"/repos/{owner}/{repo}/contents/{quote(file_path)}?ref={sha}"
+    print(f"-> Fetching file content for '{file_path}' from commit {sha[:7]}...")
+    try:
+        status, body = github_get(api_path, accept="application/vnd.github.raw")
+    except (http.client.HTTPException, OSError) as e:
+        raise RuntimeError(f"Failed to fetch '{file_path}' from commit {sha[:7]}. "
+                           f"Error: {e}") from e
+
+    if status == 404:
+        print(f"-> '{file_path}' does not exist in commit {sha[:7]}. It may be new or deleted.")
+        return b""
+    if status != 200:
+        raise RuntimeError(f"Failed to fetch '{file_path}' from commit {sha[:7]}. (HTTP {status})")
+
+    with _contents_lock:
+        _contents[cache_key] = body
+        _contents.move_to_end(cache_key)
+        if len(_contents) > _CONTENTS_MAXSIZE:
+            _contents.popitem(last=False)
+    return body
+
+
+def get_pr_shas(owner: str, repo: str, pr_number: int) -> Tuple[str, str]:
+    """
+    Fetches the base and head commit SHAs for a PR.
+    """
+    status, body = github_get(f"/repos/{owner}/{repo}/pulls/{pr_number}")
+
+    if status != 200:
+        raise RuntimeError(f"Failed to get PR details. (HTTP {status})")
+
+    try:
+        pr = json.loads(body)
+        base_sha = pr['base']['sha']
+        head_sha = pr['head']['sha']
+        return base_sha, head_sha
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"Could not parse commit SHAs from API response. Error: {e}") from e
+
+
+def get_changed_files(owner: str, repo: str, base_sha: str, head_sha: str) -> Optional[set[str]]:
+    """
+    Returns the paths of the files changed between two commits, using the
+    GitHub compare endpoint.
+
+    Returns None when the list is unavailable or may be incomplete, in which
+    case callers must not assume that any file is unchanged.
+    """
+    api_path = f"/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}?per_page=100"
+    try:
+        status, body = github_get(api_path)
+    except (http.client.HTTPException, OSError) as e:
+        print(f"Exception: Could not compare commits. Error: {e}", file=sys.stderr)
+        return None
+
+    if status != 200:
+        print(f"Exception: Could not compare commits. (HTTP {status})", file=sys.stderr)
+        return None
+
+    try:
+        files = json.loads(body)['files']
+        changed_files = {changed['filename'] for changed in files}
+        changed_files.update(changed['previous_filename'] for changed in files
+                             if 'previous_filename' in changed)
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"Exception: Could not parse compare response. Error: {e}", file=sys.stderr)
+        return None
+
+    # The compare endpoint lists at most 300 files, a full list may be truncated.
+    if len(files) >= 300:
+        return None
+
+    return changed_files
@@ -0,0 +1,152 @@
+"""Lookup of top-level sections in YAML-like rule files, without a YAML parser."""
+import re
+import sys
+import bisect
+import functools
+import itertools
+from typing import Optional
+
+
+def index_lines(file_contents):
+    """
+    Joins the lines of a file into one text and computes the offset where each line starts.
+
+    The result can be reused by find_sections_in_text for any number of lookups in the same file.
+
+    Args:
+        file_contents (list of str): The contents of the file, split into lines.
+
+    Returns:
+        tuple: The joined text, each line ending with a newline, and the list of line start
+               offsets, ending with the offset just past the text.
+    """
+    text = '\n'.join(file_contents) + '\n' if file_contents else ''
+    line_starts = list(itertools.accumulate((len(line) + 1 for line in file_contents),
+                                            initial=0))
+    return text, line_starts
+
+
+def find_sections_in_text(text, line_starts, sections, max_matches=None):
+    """
+    Finds the sections with any of the given identifiers in a text built by index_lines.
+
+    Note that this does not call into the yaml library and thus correctly handles Jinja macros at
+    the expense of not being a strictly valid yaml parsing.
+
+    Args:
+        text (str): The lines of the file, each ending with a newline.
+        line_starts (list of int): The offset where each line starts in text.
+        sections (list of str): The identifiers of the sections to find.
+        max_matches (int, optional): Stop scanning once this many sections are found for
+                                     every identifier.
+
+    Returns:
+        dict: For each identifier, a list of tuples (start, end) representing the lines
+              where the section exists.
+    """
+    # Hack to find a global key ("section"/sec) in a YAML-like file.
+    # All indented lines until the next global key are included in the range.
+    # For example:
+    #
+    # 0: not_it:
+    # 1:     - value
+    # 2: this_one:
+    # 3:      - 2
+    # 4:      - 5
+    # 5:
+    # 6: nor_this:
+    #
+    # for the section "this_one", the result [(2, 5)] will be returned.
+    # Note that multiple sections may exist in a file and each will be
+    # identified and returned.
+    sec_ranges = {sec: [] for sec in sections}
+    if not sec_ranges:
+        return sec_ranges
+
+    # A single pattern matches all the identifiers, so the text is scanned once whatever the
+    # number of sections, and the matched identifier selects where the range goes. The offsets
+    # of the matches are mapped back to line numbers with a binary search over line_starts.
+    # The lookups are hoisted out of the loop, which runs once per section found.
+    bisect_right = bisect.bisect_right
+    remaining = len(sec_ranges)
+    for match in _sections_re(tuple(sec_ranges)).finditer(text):
+        found_ranges = sec_ranges[match.group(1)]
+        if max_matches is not None and len(found_ranges) >= max_matches:
+            continue
+        match_start, match_end = match.span()
+        found_ranges.append((bisect_right(line_starts, match_start) - 1,
+                             bisect_right(line_starts, match_end) - 1))
+        if max_matches is not None and len(found_ranges) == max_matches:
+            # The rest of the text is not scanned once every section is complete.
+            remaining -= 1
+            if not remaining:
+                break
+
+    return sec_ranges
+
+
+def _trie_regex(words):
+    """
+    Returns a pattern matching any of the words, with their common prefixes factored into a
+    trie, e.g. "ab(?:c|d)" for "abc" and "abd".
+
+    The regex engine tries the alternatives of a plain "word1|word2|..." pattern one after the
+    other, so matching costs grow with the number of words. Walking the trie instead costs about
+    the length of the matched word, whatever the number of words.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a word.
+    return _trie_node_regex(trie)
+
+
+def _trie_node_regex(node):
+    """Returns the pattern matching the suffixes stored under a trie node."""
+    alternatives = [re.escape(char) + _trie_node_regex(child)
+                    for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1:
+        pattern = alternatives[0]
+    else:
+        pattern = '(?:' + '|'.join(alternatives) + ')'
+    if '' in node:
+        # A word ends here, so the rest is optional.
+        pattern = '(?:' + pattern + ')?'
+    return pattern
+
+
+@functools.lru_cache(maxsize=None)
+def _sections_re(sections: tuple, binary: bool = False) -> re.Pattern:
+    """Returns the compiled pattern matching a section with any of the given identifiers, the
+    identifier being captured in the first group. The pattern matches bytes if binary is set."""
+    # The section starts with a global key ("sec:") at column 0 and goes on through every
+    # following line that is empty or indented with spaces or tabs.
+    pattern = r'^(' + _trie_regex(sections) + r'):[^\n]*(?:\n(?=[\n \t])[^\n]*)*'
+    return re.compile(pattern.encode('utf-8') if binary else pattern, re.MULTILINE)
+
+
+def get_section_from_content(content: bytes, section: str) -> Optional[str]:
+    """
+    Extracts a section's value from the raw bytes of the file content.
+    Only the section itself is decoded, not the whole file.
+    """
+    if not content:
+        return None
+
+    if b'\r' in content:
+        content = content.replace(b'\r\n', b'\n')
+
+    # Only the first section is used, so stop scanning as soon as it is found.
+    match = _sections_re((section,), binary=True).search(content)
+    if not match:
+        return None
+
+    try:
+        return match.group().decode('utf-8')
+    except UnicodeDecodeError as e:
+        print(f"Exception: Could not decode content. Error: {e}", file=sys.stderr)
+        return None
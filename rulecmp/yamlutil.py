@@ -0,0 +1,144 @@
+"""YAML loading helpers for rule files, which may hold Jinja macros."""
+import re
+import codecs
+from typing import Any, Iterable
+
+import yaml
+
+# Prefer the libyaml-backed loader and dumper, falling back to the pure-Python ones.
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+
+class RuleLoader(SafeLoader):
+    """
+    Safe loader resolving plain scalars by the YAML 1.2 core schema, as the
+    ruamel.yaml loader used before did, instead of PyYAML's YAML 1.1 rules.
+    With those, "yes" and "on" would load as booleans, "0777" as an octal
+    number and "1:20" as a base 60 number.
+    """
+
+
+class RuleDumper(SafeDumper):
+    """Safe dumper quoting strings by the same rules as RuleLoader."""
+
+
+def _construct_yaml12_int(loader: SafeLoader, node: yaml.ScalarNode) -> int:
+    """Constructs a YAML 1.2 integer, in which a leading 0 does not mean octal."""
+    value = loader.construct_scalar(node)
+    if value.startswith('0o'):
+        return int(value[2:], 8)
+    return int(value, 16 if value.startswith('0x') else 10)
+
+
+_YAML11_TAGS = frozenset(('tag:yaml.org,2002:bool', 'tag:yaml.org,2002:int',
+                          'tag:yaml.org,2002:float'))
+
+for _cls in (RuleLoader, RuleDumper):
+    _cls.yaml_implicit_resolvers = {
+        first: [(tag, regexp) for tag, regexp in resolvers if tag not in _YAML11_TAGS]
+        for first, resolvers in SafeLoader.yaml_implicit_resolvers.items()
+    }
+    _cls.add_implicit_resolver(
+        'tag:yaml.org,2002:bool',
+        re.compile(r'^(?:true|True|TRUE|false|False|FALSE)$'),
+        list('tTfF'))
+    # Integers come before floats, whose pattern also matches them.
+    _cls.add_implicit_resolver(
+        'tag:yaml.org,2002:int',
+        re.compile(r'^(?:[-+]?[0-9]+|0o[0-7]+|0x[0-9a-fA-F]+)$'),
+        list('-+0123456789'))
+    _cls.add_implicit_resolver(
+        'tag:yaml.org,2002:float',
+        re.compile(r'^(?:[-+]?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?)(?:[eE][-+]?[0-9]+)?'
+                   r'|[-+]?\.(?:inf|Inf|INF)|\.(?:nan|NaN|NAN))$'),
+        list('-+.0123456789'))
+del _cls
+RuleLoader.add_constructor('tag:yaml.org,2002:int', _construct_yaml12_int)
+
+# Lines holding Jinja macros ("{{{ ... }}}") are not valid YAML and are dropped before parsing.
+_JINJA_RE = re.compile(rb'(?m)^[ \t]*\{\{\{.*(?:\r?\n|$)')
+
+# First characters of lines that never start a new top-level key: blank and
+# indented lines, block sequence entries and comments.
+_CONTINUATION_CHARS = frozenset((b'', b' ', b'\t', b'\r', b'\n', b'-', b'#'))
+
+
+def clean_jinja(text: bytes) -> bytes:
+    """Removes the lines holding Jinja macros from the raw text."""
+    # A substring search is much cheaper than the line-anchored regex and avoids
+    # copying the text when it has no macros at all.
+    if b'{{{' not in text:
+        return text
+    return _JINJA_RE.sub(b'', text)
+
+
+def load_yaml(text: bytes) -> Any:
+    """
+    Loads a YAML document from a rule file's raw text, ignoring Jinja macro lines.
+    The bytes are handed to the loader as is, which detects their encoding itself.
+    """
+    return yaml.load(clean_jinja(text), Loader=RuleLoader)
+
+
+def read_sections(lines: Iterable[bytes], keys_to_find: list[str]) -> bytes:
+    """
+    Returns the raw text of the top-level sections of the given keys.
+
+    A section starts with its key at column 0 and goes on until the next
+    top-level key. Only these sections need to be parsed as YAML, instead of
+    the whole file.
+    """
+    wanted = frozenset(key.encode('utf-8') for key in keys_to_find)
+    section_lines = []
+    in_section = False
+    for line in lines:
+        if line[:1] not in _CONTINUATION_CHARS and not line.startswith(b'{{{'):
+            in_section = line.split(b':', 1)[0] in wanted
+        if in_section:
+            section_lines.append(line)
+    return b''.join(section_lines)
+
+
+def load_sections(text: bytes, keys_to_find: list[str]) -> Any:
+    """
+    Loads the top-level sections of the given keys from a rule file's raw text.
+
+    Only the sections found by read_sections are parsed when that is enough. The
+    whole file is parsed instead when none of the keys is found that way, e.g.
+    for quoted keys or a space before the colon, or when the sections cannot be
+    parsed on their own, e.g. for an alias anchored in another section.
+    """
+    if text.startswith(codecs.BOM_UTF8):
+        text = text[len(codecs.BOM_UTF8):]
+    try:
+        data = load_yaml(read_sections(text.splitlines(keepends=True), keys_to_find))
+    except yaml.YAMLError:
+        data = None
+    if isinstance(data, dict) and any(key in data for key in keys_to_find):
+        return data
+    return load_yaml(text)
+
+
+def find_value(data: dict, keys_to_find: list[str]) -> Any:
+    """
+    Returns the value of the first of the given keys present in the data.
+
+    The value is returned as the loaded Python object, so it can be compared
+    directly with ==. It is only serialized when printed.
+    """
+    for key in keys_to_find:
+        if key in data:
+            return data.get(key)  # Stop searching once a key is found
+    return None
+
+
+def format_value(value: Any) -> str:
+    """Formats a value for output, dumping dictionaries and lists back to YAML."""
+    if isinstance(value, (dict, list)):
+        return yaml.dump(value, Dumper=RuleDumper, default_flow_style=False, sort_keys=False,
+                         allow_unicode=True).strip()
+    # Print the simple string value directly
+    return str(value)
@@ -1,77 +1,76 @@
-from collections import namedtuple
+import os
+import sys
+import functools
+from pathlib import Path
 
-def find_section_lines(file_contents, sec):
-    """
-    Parses the given file_contents as YAML to find the section with the given identifier.
-
-    Note that this does not call into the yaml library and thus correctly handles Jinja macros at
-    the expense of not being a strictly valid yaml parsing.
+from rulecmp.sections import find_sections_in_text, index_lines
 
-    Args:
-        file_contents (list of str): The contents of the file, split into lines.
-        sec (str): The identifier of the section to find.
-
-    Returns:
-        list of namedtuple: A list of namedtuples (start, end) representing the lines where the
-                            section exists.
+@functools.lru_cache(maxsize=16)
+def _get_file_index(yml_file, mtime_ns):
     """
-    # Hack to find a global key ("section"/sec) in a YAML-like file.
-    # All indented lines until the next global key are included in the range.
-    # For example:
-    #
-    # 0: not_it:
-    # 1:     - value
-    # 2: this_one:
-    # 3:      - 2
-    # 4:      - 5
-    # 5:
-    # 6: nor_this:
-    #
-    # for the section "this_one", the result [(2, 5)] will be returned.
-    # Note that multiple sections may exist in a file and each will be
-    # identified and returned.
-    section = namedtuple('section', ['start', 'end'])
+    Returns the lines of the file, their joined text and their offsets, shared by every
+    lookup in that file. Only the most recently used files are kept.
 
-    sec_ranges = []
-    sec_id = sec + ":"
-    sec_len = len(sec_id)
-    end_num = len(file_contents)
-    line_num = 0
+    The cached helpers take the file's modification time as an argument, so that it is part
+    of their cache key and a changed file is read again.
+    """
+    # read_text translates every newline to '\n'. str.splitlines() would also split on
+    # characters such as '\x0c', '\x85' or '\u2028', which are not line breaks in YAML.
+    lines = Path(yml_file).read_text(encoding='utf-8').split('\n')
+    if not lines[-1]:
+        lines.pop()  # The text ended with a newline.
+    return (lines, *index_lines(lines))
 
-    while line_num < end_num:
-        if len(file_contents[line_num]) >= sec_len:
-            if file_contents[line_num][0:sec_len] == sec_id:
-                begin = line_num
-                line_num += 1
-                while line_num < end_num:
-                    nonempty_line = file_contents[line_num]
-                    if nonempty_line and file_contents[line_num][0] != ' ':
-                        break
-                    line_num += 1
+def section_text(lines, rng):
+    """Returns the lines of a section from its (start, end) range."""
+    # Add 1 to `end` because Python slicing is exclusive.
+    start, end = rng
+    return lines[start : end + 1]
 
-                end = line_num - 1
-                sec_ranges.append(section(begin, end))
-        line_num += 1
+@functools.lru_cache(maxsize=128)
+def _get_section_ranges(yml_file, mtime_ns, sections, max_matches):
+    """
+    Returns the ranges of the sections, see _get_file_index. The ranges are cached without
+    the lines, so that only _get_file_index decides which files stay in memory.
+    """
+    _, text, line_starts = _get_file_index(yml_file, mtime_ns)
+    return find_sections_in_text(text, line_starts, sections, max_matches)
 
-    return sec_ranges
+def get_section_ranges(yml_file, sections, verbose=False, max_matches=None):
+    """
+    Returns the lines of the file and, for each section, the list of (start, end) ranges
+    where it was found, so that callers only copy the sections they actually use, with
+    section_text.
 
-def get_section_value(yml_file, sections):
-    sections_value = {}
+    Repeated calls for an unchanged file are served from the cache, so the returned values
+    are shared between calls and must not be modified. Callers knowing that each section
+    appears only once can pass max_matches=1 to stop reading the file as soon as all are
+    found. Returns None if the file does not exist.
+    """
     try:
-        with open(yml_file, 'r') as f:
-            lines = [line.rstrip() for line in f.readlines()]
-        for section in sections:
-            found_ranges = find_section_lines(lines, section)
-            for start, end in found_ranges:
-                print(f"\nFound a section from line {start} to {end}:")
-                # Slice the list to get the content. Add 1 to `end` because Python slicing is exclusive.
-                section_content = lines[start : end + 1]
-                sections_value[section] = section_content
-        return sections_value
+        mtime_ns = os.stat(yml_file).st_mtime_ns
+        section_ranges = _get_section_ranges(yml_file, mtime_ns, tuple(sections), max_matches)
+        lines = _get_file_index(yml_file, mtime_ns)[0]
     except FileNotFoundError:
         print(f"ERROR: The file '{yml_file}' was not found.", file=sys.stderr)
+        return None
+    # Printed here rather than in the cached helper, so that cached lookups print too.
+    if verbose:
+        for found_ranges in section_ranges.values():
+            for start, end in found_ranges:
+                print(f"\nFound a section from line {start} to {end}:")
+    return lines, section_ranges
 
-sections_value = get_section_value("sysctl_kernel_yama_ptrace_scope_value.var", ["test"])
-print(sections_value)
-
+def get_section_value(yml_file, sections, verbose=False, max_matches=None):
+    """Returns the lines of each section found in the file, as get_section_ranges finds them."""
+    found = get_section_ranges(yml_file, sections, verbose, max_matches)
+    if found is None:
+        return None
+    lines, section_ranges = found
+    # The last occurrence of each section found wins.
+    return {section: section_text(lines, found_ranges[-1])
+            for section, found_ranges in section_ranges.items() if found_ranges}
 
+if __name__ == "__main__":
+    sections_value = get_section_value("sysctl_kernel_yama_ptrace_scope_value.var", ["test"])
+    print(sections_value)